@@ -1,92 +1,65 @@
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from flask_cors import CORS
-from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
-import os
-from dotenv import load_dotenv
+from flask import Blueprint, Flask, g, request, jsonify
+from flask_jwt_extended import create_access_token
+from flask_migrate import upgrade
+from sqlalchemy import update, delete, func
+import msgspec
+from config import Config
+from core import (
+    db, init_app, auth_required, User, Task,
+    USERNAME_RE, EMAIL_RE, EMAIL_MAX_LENGTH, TITLE_MAX_LENGTH, RegisterBody, LoginBody,
+    TASK_COLUMNS, user_by_name, users_by_name_or_email, tasks_for_user, tasks_with_description_for_user,
+)
 
-# Load environment variables
-load_dotenv()
+api = Blueprint('api', __name__)
 
-# Initialize Flask app
-app = Flask(__name__)
+def create_app(config_class=Config, **overrides):
+    """Create and configure the app; keyword arguments override config keys"""
+    app = Flask(__name__)
+    init_app(app, config_class, **overrides)
+    app.register_blueprint(api)
+    return app
 
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///task_manager.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-
-# Initialize extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-jwt = JWTManager(app)
-CORS(app)
-
-# Models
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-    
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-class Task(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=True)
-    completed = db.Column(db.Boolean, default=False, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'completed': self.completed,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+def _task_row_to_dict(row):
+    """Build a task response dict from a column-projected result row"""
+    task = dict(row._mapping)
+    task['created_at'] = task['created_at'].isoformat()
+    task['updated_at'] = task['updated_at'].isoformat()
+    return task
 
 # Routes
-@app.route('/')
+@api.route('/')
 def home():
     return jsonify({'message': 'Task Manager API', 'version': '1.0'})
 
 # User Authentication Routes
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
 def register():
     try:
-        data = request.get_json()
-        
-        if not data or not data.get('username') or not data.get('email') or not data.get('password'):
+        try:
+            data = msgspec.json.decode(request.get_data(), type=RegisterBody)
+        except msgspec.DecodeError:
             return jsonify({'error': 'Username, email, and password are required'}), 400
         
-        # Check if user already exists
-        if User.query.filter_by(username=data['username']).first():
+        if not USERNAME_RE.match(data.username):
+            return jsonify({'error': 'Username must be 3-80 letters, digits, "_", "." or "-"'}), 400
+        
+        if len(data.email) > EMAIL_MAX_LENGTH or not EMAIL_RE.match(data.email):
+            return jsonify({'error': 'Invalid email address'}), 400
+        
+        # Check if user already exists (username and email in one round-trip)
+        existing = db.session.execute(users_by_name_or_email, {'u': data.username, 'e': data.email}).all()
+        if any(row.username == data.username for row in existing):
             return jsonify({'error': 'Username already exists'}), 400
         
-        if User.query.filter_by(email=data['email']).first():
+        if existing:
             return jsonify({'error': 'Email already exists'}), 400
         
         # Create new user
         user = User(
-            username=data['username'],
-            email=data['email']
+            username=data.username,
+            email=data.email
         )
-        user.set_password(data['password'])
+        user.set_password(data.password)
         
         db.session.add(user)
         db.session.commit()
@@ -107,17 +80,22 @@ def register():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     try:
-        data = request.get_json()
-        
-        if not data or not data.get('username') or not data.get('password'):
+        try:
+            data = msgspec.json.decode(request.get_data(), type=LoginBody)
+        except msgspec.DecodeError:
             return jsonify({'error': 'Username and password are required'}), 400
         
-        user = User.query.filter_by(username=data['username']).first()
+        user = db.session.execute(user_by_name, {'u': data.username}).scalar_one_or_none()
         
-        if user and user.check_password(data['password']):
+        if user and user.check_password(data.password):
+            # Transparently upgrade legacy or outdated hashes on successful login
+            if user.needs_rehash():
+                user.set_password(data.password)
+                db.session.commit()
+            
             access_token = create_access_token(identity=user.id)
             return jsonify({
                 'message': 'Login successful',
@@ -135,31 +113,46 @@ def login():
         return jsonify({'error': str(e)}), 500
 
 # Task CRUD Routes
-@app.route('/api/tasks', methods=['GET'])
-@jwt_required()
+@api.route('/api/tasks', methods=['GET'])
+@auth_required
 def get_tasks():
     try:
-        user_id = get_jwt_identity()
-        tasks = Task.query.filter_by(user_id=user_id).order_by(Task.created_at.desc()).all()
+        user_id = g.user_id
+        
+        # Description is only fetched when asked for via ?include=description
+        if request.args.get('include') == 'description':
+            stmt = tasks_with_description_for_user
+        else:
+            stmt = tasks_for_user
+        rows = db.session.execute(stmt, {'uid': user_id}).all()
         
         return jsonify({
-            'tasks': [task.to_dict() for task in tasks],
-            'count': len(tasks)
+            'tasks': [_task_row_to_dict(row) for row in rows],
+            'count': len(rows)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/tasks', methods=['POST'])
-@jwt_required()
+@api.route('/api/tasks', methods=['POST'])
+@auth_required
 def create_task():
     try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
+        user_id = g.user_id
+        data = request.get_json(silent=True)
+        
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         
-        if not data or not data.get('title'):
+        if not data.get('title'):
             return jsonify({'error': 'Title is required'}), 400
         
+        if not isinstance(data['title'], str):
+            return jsonify({'error': 'Title must be a string'}), 400
+        
+        if len(data['title']) > TITLE_MAX_LENGTH:
+            return jsonify({'error': f'Title must be at most {TITLE_MAX_LENGTH} characters'}), 400
+        
         task = Task(
             title=data['title'],
             description=data.get('description', ''),
@@ -167,24 +160,27 @@ def create_task():
         )
         
         db.session.add(task)
+        db.session.flush()
+        # Serialize before commit() expires the row, using the values the INSERT returned
+        task_dict = task.to_dict()
         db.session.commit()
         
         return jsonify({
             'message': 'Task created successfully',
-            'task': task.to_dict()
+            'task': task_dict
         }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/tasks/<int:task_id>', methods=['GET'])
-@jwt_required()
+@api.route('/api/tasks/<int:task_id>', methods=['GET'])
+@auth_required
 def get_task(task_id):
     try:
-        user_id = get_jwt_identity()
-        task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+        user_id = g.user_id
+        task = db.session.get(Task, task_id)
         
-        if not task:
+        if task is None or task.user_id != user_id:
             return jsonify({'error': 'Task not found'}), 404
         
         return jsonify({'task': task.to_dict()}), 200
@@ -192,47 +188,60 @@ def get_task(task_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/tasks/<int:task_id>', methods=['PUT'])
-@jwt_required()
+@api.route('/api/tasks/<int:task_id>', methods=['PUT'])
+@auth_required
 def update_task(task_id):
     try:
-        user_id = get_jwt_identity()
-        task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+        user_id = g.user_id
+        data = request.get_json(silent=True)
         
-        if not task:
-            return jsonify({'error': 'Task not found'}), 404
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        
+        if 'title' in data and not isinstance(data['title'], str):
+            return jsonify({'error': 'Title must be a string'}), 400
         
-        data = request.get_json()
+        if len(data.get('title', '')) > TITLE_MAX_LENGTH:
+            return jsonify({'error': f'Title must be at most {TITLE_MAX_LENGTH} characters'}), 400
         
-        if 'title' in data:
-            task.title = data['title']
-        if 'description' in data:
-            task.description = data['description']
-        if 'completed' in data:
-            task.completed = data['completed']
+        # Update and read back the owned row in a single statement
+        patch = {key: data[key] for key in ('title', 'description', 'completed') if key in data}
+        row = db.session.execute(
+            update(Task)
+            .where(Task.id == task_id, Task.user_id == user_id)
+            .values(**patch, updated_at=func.now())
+            .returning(*TASK_COLUMNS)
+        ).one_or_none()
+        
+        if row is None:
+            db.session.rollback()
+            return jsonify({'error': 'Task not found'}), 404
         
-        task.updated_at = datetime.utcnow()
         db.session.commit()
         
         return jsonify({
             'message': 'Task updated successfully',
-            'task': task.to_dict()
+            'task': _task_row_to_dict(row)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
-@jwt_required()
+@api.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@auth_required
 def delete_task(task_id):
     try:
-        user_id = get_jwt_identity()
-        task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+        user_id = g.user_id
+        deleted = db.session.execute(
+            delete(Task)
+            .where(Task.id == task_id, Task.user_id == user_id)
+            .returning(Task.id)
+        ).first()
         
-        if not task:
+        if deleted is None:
+            db.session.rollback()
             return jsonify({'error': 'Task not found'}), 404
         
-        db.session.delete(task)
         db.session.commit()
         
         return jsonify({'message': 'Task deleted successfully'}), 200
@@ -241,15 +250,17 @@ def delete_task(task_id):
         return jsonify({'error': str(e)}), 500
 
 # Error handlers
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        db.create_all()
+        upgrade()
+    print("⚠️  Running the Werkzeug development server; use 'gunicorn wsgi:app' in production")
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,110 +1,76 @@
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from flask_cors import CORS
+from flask import Blueprint, Flask, g, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import create_access_token
+from flask_migrate import upgrade
 from flask_restx import Api, Resource, fields, Namespace
-from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Initialize Flask app
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///task_manager.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-
-# Initialize extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-jwt = JWTManager(app)
-CORS(app)
-
-# Initialize Flask-RESTX
-api = Api(
-    app,
-    version='1.0',
-    title='Task Manager API',
-    description='A RESTful API for managing tasks with user authentication',
-    doc='/docs/',
-    prefix='/api'
+from sqlalchemy import update, delete, func
+import msgspec
+import orjson
+from config import Config
+from core import (
+    db, init_app, auth_required, User, Task,
+    USERNAME_RE, EMAIL_RE, EMAIL_MAX_LENGTH, TITLE_MAX_LENGTH, RegisterBody, LoginBody,
+    TASK_COLUMNS, user_by_name, users_by_name_or_email, tasks_for_user, tasks_with_description_for_user,
 )
 
 # Create namespaces
 auth_ns = Namespace('auth', description='Authentication operations')
 tasks_ns = Namespace('tasks', description='Task operations')
 
-# Add namespaces to API
-api.add_namespace(auth_ns)
-api.add_namespace(tasks_ns)
+# Root route and error handlers
+site = Blueprint('site', __name__)
 
-# Models
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+def create_app(config_class=Config, **overrides):
+    """Create and configure the app; keyword arguments override config keys"""
+    app = Flask(__name__)
+    init_app(app, config_class, **overrides)
     
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+    # Initialize Flask-RESTX
+    api = Api(
+        app,
+        version='1.0',
+        title='Task Manager API',
+        description='A RESTful API for managing tasks with user authentication',
+        doc='/docs/',
+        prefix='/api'
+    )
     
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-class Task(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=True)
-    completed = db.Column(db.Boolean, default=False, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Add namespaces to API
+    api.add_namespace(auth_ns)
+    api.add_namespace(tasks_ns)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'completed': self.completed,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+    app.register_blueprint(site)
+    return app
+
+def jsonify_fast(payload, status=200):
+    """Serialize payload with orjson, bypassing Flask-RESTX marshalling"""
+    return current_app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
 
 # API Models for Swagger documentation
-user_model = api.model('User', {
+user_model = auth_ns.model('User', {
     'id': fields.Integer(readonly=True, description='User ID'),
     'username': fields.String(required=True, description='Username'),
     'email': fields.String(required=True, description='Email address'),
     'created_at': fields.DateTime(readonly=True, description='Creation timestamp')
 })
 
-user_registration = api.model('UserRegistration', {
+user_registration = auth_ns.model('UserRegistration', {
     'username': fields.String(required=True, description='Username'),
     'email': fields.String(required=True, description='Email address'),
     'password': fields.String(required=True, description='Password')
 })
 
-user_login = api.model('UserLogin', {
+user_login = auth_ns.model('UserLogin', {
     'username': fields.String(required=True, description='Username'),
     'password': fields.String(required=True, description='Password')
 })
 
-auth_response = api.model('AuthResponse', {
+auth_response = auth_ns.model('AuthResponse', {
     'message': fields.String(description='Response message'),
     'access_token': fields.String(description='JWT access token'),
     'user': fields.Nested(user_model, description='User information')
 })
 
-task_model = api.model('Task', {
+task_model = tasks_ns.model('Task', {
     'id': fields.Integer(readonly=True, description='Task ID'),
     'title': fields.String(required=True, description='Task title'),
     'description': fields.String(description='Task description'),
@@ -113,58 +79,74 @@ task_model = api.model('Task', {
     'updated_at': fields.DateTime(readonly=True, description='Last update timestamp')
 })
 
-task_create = api.model('TaskCreate', {
+task_create = tasks_ns.model('TaskCreate', {
     'title': fields.String(required=True, description='Task title'),
     'description': fields.String(description='Task description')
 })
 
-task_update = api.model('TaskUpdate', {
+task_update = tasks_ns.model('TaskUpdate', {
     'title': fields.String(description='Task title'),
     'description': fields.String(description='Task description'),
     'completed': fields.Boolean(description='Task completion status')
 })
 
-task_response = api.model('TaskResponse', {
+task_response = tasks_ns.model('TaskResponse', {
     'message': fields.String(description='Response message'),
     'task': fields.Nested(task_model, description='Task information')
 })
 
-tasks_response = api.model('TasksResponse', {
-    'tasks': fields.List(fields.Nested(task_model), description='List of tasks'),
+# List items leave out the description; ?include=description adds it back
+task_summary = tasks_ns.model('TaskSummary', {
+    'id': fields.Integer(readonly=True, description='Task ID'),
+    'title': fields.String(required=True, description='Task title'),
+    'completed': fields.Boolean(description='Task completion status'),
+    'created_at': fields.DateTime(readonly=True, description='Creation timestamp'),
+    'updated_at': fields.DateTime(readonly=True, description='Last update timestamp')
+})
+
+tasks_response = tasks_ns.model('TasksResponse', {
+    'tasks': fields.List(fields.Nested(task_summary), description='List of tasks'),
     'count': fields.Integer(description='Number of tasks')
 })
 
-error_model = api.model('Error', {
+error_model = auth_ns.model('Error', {
     'error': fields.String(description='Error message')
 })
 
 # Authentication Routes
 @auth_ns.route('/register')
 class UserRegistration(Resource):
-    @api.expect(user_registration)
-    @api.marshal_with(auth_response, code=201)
-    @api.marshal_with(error_model, code=400)
+    @auth_ns.expect(user_registration)
+    @auth_ns.response(201, 'User created', auth_response)
+    @auth_ns.response(400, 'Validation error', error_model)
     def post(self):
         """Register a new user"""
         try:
-            data = request.get_json()
+            try:
+                data = msgspec.json.decode(request.get_data(), type=RegisterBody)
+            except msgspec.DecodeError:
+                return jsonify_fast({'error': 'Username, email, and password are required'}, 400)
+            
+            if not USERNAME_RE.match(data.username):
+                return jsonify_fast({'error': 'Username must be 3-80 letters, digits, "_", "." or "-"'}, 400)
             
-            if not data or not data.get('username') or not data.get('email') or not data.get('password'):
-                return {'error': 'Username, email, and password are required'}, 400
+            if len(data.email) > EMAIL_MAX_LENGTH or not EMAIL_RE.match(data.email):
+                return jsonify_fast({'error': 'Invalid email address'}, 400)
             
-            # Check if user already exists
-            if User.query.filter_by(username=data['username']).first():
-                return {'error': 'Username already exists'}, 400
+            # Check if user already exists (username and email in one round-trip)
+            existing = db.session.execute(users_by_name_or_email, {'u': data.username, 'e': data.email}).all()
+            if any(row.username == data.username for row in existing):
+                return jsonify_fast({'error': 'Username already exists'}, 400)
             
-            if User.query.filter_by(email=data['email']).first():
-                return {'error': 'Email already exists'}, 400
+            if existing:
+                return jsonify_fast({'error': 'Email already exists'}, 400)
             
             # Create new user
             user = User(
-                username=data['username'],
-                email=data['email']
+                username=data.username,
+                email=data.email
             )
-            user.set_password(data['password'])
+            user.set_password(data.password)
             
             db.session.add(user)
             db.session.commit()
@@ -172,7 +154,7 @@ class UserRegistration(Resource):
             # Generate access token
             access_token = create_access_token(identity=user.id)
             
-            return {
+            return jsonify_fast({
                 'message': 'User created successfully',
                 'access_token': access_token,
                 'user': {
@@ -181,29 +163,34 @@ class UserRegistration(Resource):
                     'email': user.email,
                     'created_at': user.created_at
                 }
-            }, 201
+            }, 201)
             
         except Exception as e:
-            return {'error': str(e)}, 500
+            return jsonify_fast({'error': str(e)}, 500)
 
 @auth_ns.route('/login')
 class UserLogin(Resource):
-    @api.expect(user_login)
-    @api.marshal_with(auth_response, code=200)
-    @api.marshal_with(error_model, code=401)
+    @auth_ns.expect(user_login)
+    @auth_ns.response(200, 'Login successful', auth_response)
+    @auth_ns.response(401, 'Invalid credentials', error_model)
     def post(self):
         """Login user"""
         try:
-            data = request.get_json()
+            try:
+                data = msgspec.json.decode(request.get_data(), type=LoginBody)
+            except msgspec.DecodeError:
+                return jsonify_fast({'error': 'Username and password are required'}, 400)
             
-            if not data or not data.get('username') or not data.get('password'):
-                return {'error': 'Username and password are required'}, 400
+            user = db.session.execute(user_by_name, {'u': data.username}).scalar_one_or_none()
             
-            user = User.query.filter_by(username=data['username']).first()
-            
-            if user and user.check_password(data['password']):
+            if user and user.check_password(data.password):
+                # Transparently upgrade legacy or outdated hashes on successful login
+                if user.needs_rehash():
+                    user.set_password(data.password)
+                    db.session.commit()
+                
                 access_token = create_access_token(identity=user.id)
-                return {
+                return jsonify_fast({
                     'message': 'Login successful',
                     'access_token': access_token,
                     'user': {
@@ -212,45 +199,72 @@ class UserLogin(Resource):
                         'email': user.email,
                         'created_at': user.created_at
                     }
-                }, 200
+                }, 200)
             else:
-                return {'error': 'Invalid credentials'}, 401
+                return jsonify_fast({'error': 'Invalid credentials'}, 401)
                 
         except Exception as e:
-            return {'error': str(e)}, 500
+            return jsonify_fast({'error': str(e)}, 500)
 
 # Task Routes
 @tasks_ns.route('')
 class TaskList(Resource):
-    @jwt_required()
-    @api.marshal_with(tasks_response, code=200)
-    @api.marshal_with(error_model, code=500)
+    @auth_required
+    @tasks_ns.doc(params={'include': "Set to 'description' to include task descriptions"})
+    @tasks_ns.response(200, 'Success', tasks_response)
+    @tasks_ns.response(500, 'Internal server error', error_model)
     def get(self):
         """Get all tasks for the authenticated user"""
         try:
-            user_id = get_jwt_identity()
-            tasks = Task.query.filter_by(user_id=user_id).order_by(Task.created_at.desc()).all()
+            user_id = g.user_id
+            
+            # Description is only fetched when asked for via ?include=description
+            if request.args.get('include') == 'description':
+                stmt = tasks_with_description_for_user
+            else:
+                stmt = tasks_for_user
+            result = db.session.execute(stmt, {'uid': user_id}, execution_options={'yield_per': 500})
+            
+            # Fetch the first batch before the headers go out, so query errors still get a 500;
+            # a later failure can only cut the stream short, leaving the client invalid JSON
+            partitions = result.partitions()
+            first = next(partitions, [])
             
-            return {
-                'tasks': [task.to_dict() for task in tasks],
-                'count': len(tasks)
-            }, 200
+            def generate():
+                # Emit one chunk per fetched batch so memory stays flat for long lists
+                count = len(first)
+                yield b'{"tasks":[' + b','.join(orjson.dumps(dict(row._mapping)) for row in first)
+                for rows in partitions:
+                    yield b',' + b','.join(orjson.dumps(dict(row._mapping)) for row in rows)
+                    count += len(rows)
+                yield b'],"count":%d}' % count
+            
+            return Response(stream_with_context(generate()), mimetype='application/json')
             
         except Exception as e:
-            return {'error': str(e)}, 500
+            return jsonify_fast({'error': str(e)}, 500)
 
-    @jwt_required()
-    @api.expect(task_create)
-    @api.marshal_with(task_response, code=201)
-    @api.marshal_with(error_model, code=400)
+    @auth_required
+    @tasks_ns.expect(task_create)
+    @tasks_ns.response(201, 'Task created', task_response)
+    @tasks_ns.response(400, 'Validation error', error_model)
     def post(self):
         """Create a new task"""
         try:
-            user_id = get_jwt_identity()
-            data = request.get_json()
+            user_id = g.user_id
+            data = request.get_json(silent=True)
+            
+            if not isinstance(data, dict):
+                return jsonify_fast({'error': 'Request body must be a JSON object'}, 400)
+            
+            if not data.get('title'):
+                return jsonify_fast({'error': 'Title is required'}, 400)
             
-            if not data or not data.get('title'):
-                return {'error': 'Title is required'}, 400
+            if not isinstance(data['title'], str):
+                return jsonify_fast({'error': 'Title must be a string'}, 400)
+            
+            if len(data['title']) > TITLE_MAX_LENGTH:
+                return jsonify_fast({'error': f'Title must be at most {TITLE_MAX_LENGTH} characters'}, 400)
             
             task = Task(
                 title=data['title'],
@@ -259,90 +273,106 @@ class TaskList(Resource):
             )
             
             db.session.add(task)
+            db.session.flush()
+            # Serialize before commit() expires the row, using the values the INSERT returned
+            task_dict = task.to_dict()
             db.session.commit()
             
-            return {
+            return jsonify_fast({
                 'message': 'Task created successfully',
-                'task': task.to_dict()
-            }, 201
+                'task': task_dict
+            }, 201)
             
         except Exception as e:
-            return {'error': str(e)}, 500
+            return jsonify_fast({'error': str(e)}, 500)
 
 @tasks_ns.route('/<int:task_id>')
 class TaskResource(Resource):
-    @jwt_required()
-    @api.marshal_with(task_model, code=200)
-    @api.marshal_with(error_model, code=404)
+    @auth_required
+    @tasks_ns.response(200, 'Success', task_model)
+    @tasks_ns.response(404, 'Task not found', error_model)
     def get(self, task_id):
         """Get a specific task"""
         try:
-            user_id = get_jwt_identity()
-            task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+            user_id = g.user_id
+            task = db.session.get(Task, task_id)
             
-            if not task:
-                return {'error': 'Task not found'}, 404
+            if task is None or task.user_id != user_id:
+                return jsonify_fast({'error': 'Task not found'}, 404)
             
-            return task.to_dict(), 200
+            return jsonify_fast(task.to_dict(), 200)
             
         except Exception as e:
-            return {'error': str(e)}, 500
+            return jsonify_fast({'error': str(e)}, 500)
 
-    @jwt_required()
-    @api.expect(task_update)
-    @api.marshal_with(task_response, code=200)
-    @api.marshal_with(error_model, code=404)
+    @auth_required
+    @tasks_ns.expect(task_update)
+    @tasks_ns.response(200, 'Task updated', task_response)
+    @tasks_ns.response(404, 'Task not found', error_model)
     def put(self, task_id):
         """Update a specific task"""
         try:
-            user_id = get_jwt_identity()
-            task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+            user_id = g.user_id
+            data = request.get_json(silent=True)
+            
+            if not isinstance(data, dict):
+                return jsonify_fast({'error': 'Request body must be a JSON object'}, 400)
+            
+            if 'title' in data and not isinstance(data['title'], str):
+                return jsonify_fast({'error': 'Title must be a string'}, 400)
             
-            if not task:
-                return {'error': 'Task not found'}, 404
+            if len(data.get('title', '')) > TITLE_MAX_LENGTH:
+                return jsonify_fast({'error': f'Title must be at most {TITLE_MAX_LENGTH} characters'}, 400)
             
-            data = request.get_json()
+            # Update and read back the owned row in a single statement
+            patch = {key: data[key] for key in ('title', 'description', 'completed') if key in data}
+            row = db.session.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.user_id == user_id)
+                .values(**patch, updated_at=func.now())
+                .returning(*TASK_COLUMNS)
+            ).one_or_none()
             
-            if 'title' in data:
-                task.title = data['title']
-            if 'description' in data:
-                task.description = data['description']
-            if 'completed' in data:
-                task.completed = data['completed']
+            if row is None:
+                db.session.rollback()
+                return jsonify_fast({'error': 'Task not found'}, 404)
             
-            task.updated_at = datetime.utcnow()
             db.session.commit()
             
-            return {
+            return jsonify_fast({
                 'message': 'Task updated successfully',
-                'task': task.to_dict()
-            }, 200
+                'task': dict(row._mapping)
+            }, 200)
             
         except Exception as e:
-            return {'error': str(e)}, 500
+            return jsonify_fast({'error': str(e)}, 500)
 
-    @jwt_required()
-    @api.marshal_with(error_model, code=200)
-    @api.marshal_with(error_model, code=404)
+    @auth_required
+    @tasks_ns.response(200, 'Task deleted')
+    @tasks_ns.response(404, 'Task not found', error_model)
     def delete(self, task_id):
         """Delete a specific task"""
         try:
-            user_id = get_jwt_identity()
-            task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+            user_id = g.user_id
+            deleted = db.session.execute(
+                delete(Task)
+                .where(Task.id == task_id, Task.user_id == user_id)
+                .returning(Task.id)
+            ).first()
             
-            if not task:
-                return {'error': 'Task not found'}, 404
+            if deleted is None:
+                db.session.rollback()
+                return jsonify_fast({'error': 'Task not found'}, 404)
             
-            db.session.delete(task)
             db.session.commit()
             
-            return {'message': 'Task deleted successfully'}, 200
+            return jsonify_fast({'message': 'Task deleted successfully'}, 200)
             
         except Exception as e:
-            return {'error': str(e)}, 500
+            return jsonify_fast({'error': str(e)}, 500)
 
 # Root route
-@app.route('/')
+@site.route('/')
 def home():
     return jsonify({
         'message': 'Task Manager API',
@@ -355,16 +385,18 @@ def home():
     })
 
 # Error handlers
-@app.errorhandler(404)
+@site.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
-@app.errorhandler(500)
+@site.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        db.create_all()
+        upgrade()
+    print("⚠️  Running the Werkzeug development server; use 'gunicorn wsgi:app' in production")
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -1,4 +1,5 @@
 import os
+from sqlalchemy.pool import StaticPool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,3 +10,39 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = 86400  # 24 hours in seconds
+    PASSWORD_HASH_TARGET_MS = int(os.getenv('PASSWORD_HASH_TARGET_MS', '250'))
+    # Set to share one Argon2id cost across hosts instead of calibrating on each
+    PASSWORD_HASH_TIME_COST = int(os.getenv('PASSWORD_HASH_TIME_COST', '0')) or None
+    PASSWORD_HASH_MEMORY_COST = int(os.getenv('PASSWORD_HASH_MEMORY_COST', 64 * 1024))  # KiB
+    COMPRESS_ALGORITHM = ['br', 'gzip', 'deflate']
+    # Flask-Compress leaves gzip out of streamed responses unless told otherwise
+    COMPRESS_ALGORITHM_STREAMING = ['br', 'gzip', 'deflate']
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 4
+    COMPRESS_DEFLATE_LEVEL = 4
+
+class TestingConfig(Config):
+    TESTING = True
+    # Cheapest Argon2id parameters the library accepts
+    PASSWORD_HASH_TIME_COST = 1
+    PASSWORD_HASH_MEMORY_COST = 8
+    SQLALCHEMY_ECHO = False
+    PROPAGATE_EXCEPTIONS = True
+
+def engine_options(uri):
+    """SQLAlchemy engine options suited to the database at uri"""
+    if not uri.startswith('sqlite'):
+        # Keep a right-sized, health-checked connection pool for server databases
+        return {
+            'pool_size': int(os.getenv('SQLALCHEMY_POOL_SIZE', 30)),
+            'max_overflow': int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', 10)),
+            'pool_recycle': int(os.getenv('SQLALCHEMY_POOL_RECYCLE', 3600)),
+            'pool_pre_ping': True,
+        }
+    if 'mode=memory' in uri:
+        # Shared-cache in-memory SQLite lives only as long as a connection holds it open
+        return {
+            'poolclass': StaticPool,
+            'connect_args': {'uri': True, 'check_same_thread': False},
+        }
+    return {}
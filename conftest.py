@@ -0,0 +1,151 @@
+"""Shared fixtures for the test suite"""
+
+import functools
+import os
+import pytest
+import re
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app import create_app
+from config import TestingConfig
+from core import db, User, Task
+from flask_jwt_extended import create_access_token
+
+# Each pytest-xdist worker gets its own named in-memory database
+_WORKER = os.environ.get('PYTEST_XDIST_WORKER', 'gw0')
+
+def _test_config(factory):
+    """Config overrides giving each app factory its own in-memory database"""
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///file:memdb_{factory.__module__}_{_WORKER}?mode=memory&cache=shared&uri=true',
+        'JWT_SECRET_KEY': 'test-secret-key',
+    }
+
+@functools.lru_cache(maxsize=None)
+def _make_app(factory=create_app):
+    """Build an app and its schema once per factory"""
+    app = factory(TestingConfig, **_test_config(factory))
+    
+    with app.app_context():
+        # Let SQLAlchemy emit BEGIN itself so pysqlite honours SAVEPOINTs
+        @event.listens_for(db.engine, 'connect')
+        def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+        
+        @event.listens_for(db.engine, 'begin')
+        def _emit_begin(connection):
+            connection.exec_driver_sql('BEGIN')
+        
+        db.create_all()
+    return app
+
+@functools.lru_cache(maxsize=32)
+def _token_for(app, user_id):
+    """Sign an access token once per app and identity for the whole session"""
+    if has_app_context() and current_app._get_current_object() is app:
+        # Popping a nested context would tear down the running test's session
+        return create_access_token(identity=user_id)
+    with app.app_context():
+        return create_access_token(identity=user_id)
+
+@pytest.fixture
+def app(request):
+    """The app under test, built once per session; parametrize it indirectly with another factory"""
+    return _make_app(getattr(request, 'param', create_app))
+
+@pytest.fixture
+def client(app):
+    """Create a test client"""
+    return app.test_client()
+
+@pytest.fixture(autouse=True)
+def db_transaction(app):
+    """Run each test in its own app context and a transaction that is rolled back afterwards"""
+    # The shared test user must be committed before the test's session is swapped in
+    _user_for(app)
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        # Commits inside the app only release a SAVEPOINT of the outer transaction
+        session = scoped_session(sessionmaker(bind=connection, join_transaction_mode='create_savepoint'))
+        app_session, db.session = db.session, session
+        
+        yield session
+        
+        session.remove()
+        transaction.rollback()
+        connection.close()
+        db.session = app_session
+
+@functools.lru_cache(maxsize=None)
+def _user_for(app):
+    """Create the test user once per app, outside the per-test transactions"""
+    with app.app_context():
+        user = User(username='testuser', email='test@example.com')
+        user.set_password('testpassword')
+        db.session.add(user)
+        db.session.commit()
+        # Detach with its attributes loaded so every test can read it
+        db.session.refresh(user)
+        db.session.expunge(user)
+        db.session.remove()
+    return user
+
+@pytest.fixture
+def test_user(app):
+    """Create a test user"""
+    return _user_for(app)
+
+@pytest.fixture
+def duplicate_user():
+    """Create a user for tests that collide with an existing account"""
+    user = User(username='dupuser', email='dup@example.com')
+    user.set_password('duppassword')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@functools.lru_cache(maxsize=32)
+def _headers_for(app, user_id):
+    """Build the Authorization header once per app and identity, as immutable (name, value) pairs"""
+    return (('Authorization', f'Bearer {_token_for(app, user_id)}'),)
+
+@pytest.fixture
+def headers_for(app):
+    """Build the Authorization header for any user id in the app under test"""
+    return functools.partial(_headers_for, app)
+
+@pytest.fixture
+def make_app():
+    """Build the test app for a given factory, once per session"""
+    return _make_app
+
+@pytest.fixture
+def auth_headers(app, test_user):
+    """Create authentication headers"""
+    return _headers_for(app, test_user.id)
+
+@pytest.fixture
+def test_task(test_user):
+    """Create a test task"""
+    task = Task(
+        title='Test Task',
+        description='Test Description',
+        user_id=test_user.id
+    )
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'perf: performance benchmarks, run with `pytest -m perf`')
+
+def pytest_collection_modifyitems(config, items):
+    # Benchmarks only run when the -m expression names them
+    if re.search(r'\bperf\b', config.option.markexpr or ''):
+        return
+    skipped = [item for item in items if item.get_closest_marker('perf')]
+    if skipped:
+        config.hook.pytest_deselected(items=skipped)
+        items[:] = [item for item in items if not item.get_closest_marker('perf')]
@@ -0,0 +1,242 @@
+"""
+Extensions, models and helpers shared by app.py and app_with_docs.py
+"""
+
+from flask import g, current_app
+from flask.json.provider import DefaultJSONProvider
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
+from flask_cors import CORS
+from flask_compress import Compress
+from sqlalchemy import select, bindparam, or_, func
+from sqlalchemy.sql import lambda_stmt
+from functools import wraps
+from typing import Annotated
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher, extract_parameters
+from argon2.exceptions import InvalidHashError, VerificationError
+from cachetools import TLRUCache
+import hashlib
+import msgspec
+import orjson
+import os
+import re
+import statistics
+import threading
+import time
+from config import Config, engine_options
+
+JWT_CLAIMS_CACHE_TTL = 30  # seconds
+
+def _claims_ttu(key, claims, now):
+    # Never keep claims past the token's own expiry
+    return min(now + JWT_CLAIMS_CACHE_TTL, claims.get('exp', now + JWT_CLAIMS_CACHE_TTL))
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that reuses decoded claims of recently verified tokens"""
+
+    def init_app(self, app, add_context_processor=False):
+        super().init_app(app, add_context_processor)
+        # One cache per app, so claims verified under one secret are never trusted by another
+        app.extensions['jwt_claims_cache'] = (
+            TLRUCache(maxsize=10_000, ttu=_claims_ttu, timer=time.time),
+            threading.Lock(),
+        )
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        cache, lock = current_app.extensions['jwt_claims_cache']
+        key = hashlib.sha256(encoded_token.encode()).digest()[:16]
+        with lock:
+            claims = cache.get(key)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token)
+            with lock:
+                cache[key] = claims
+        return claims
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for jsonify() and request.get_json()"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Extensions, bound to an app by init_app()
+db = SQLAlchemy()
+# SQLite can only ALTER columns by copying the table, so migrations run in batch mode
+migrate = Migrate(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'), render_as_batch=True)
+jwt = CachingJWTManager()
+cors = CORS()
+compress = Compress()
+
+# JWT signing key as bytes, resolved once per app instead of on every sign/verify
+@jwt.encode_key_loader
+def _jwt_encode_key(identity):
+    return current_app.config['JWT_KEY_BYTES']
+
+@jwt.decode_key_loader
+def _jwt_decode_key(jwt_header, jwt_data):
+    return current_app.config['JWT_KEY_BYTES']
+
+def auth_required(fn):
+    """jwt_required() that also stores the caller's identity on g.user_id"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        # Identities are user ids; tokens may carry them as strings
+        g.user_id = int(get_jwt_identity())
+        return fn(*args, **kwargs)
+    return wrapper
+
+def _calibrate_password_hasher(target_ms, memory_cost=64 * 1024, max_time_cost=10):
+    """Return the cheapest Argon2id hasher whose median hash time reaches target_ms"""
+    for time_cost in range(1, max_time_cost + 1):
+        hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=1, hash_len=32)
+        samples = []
+        for _ in range(3):
+            start = time.perf_counter_ns()
+            hasher.hash('bench')
+            samples.append(time.perf_counter_ns() - start)
+        if statistics.median(samples) >= target_ms * 1_000_000:
+            break
+    return hasher
+
+_hasher_lock = threading.Lock()
+
+def password_hasher():
+    """Return the app's Argon2id hasher, built on first use
+
+    PASSWORD_HASH_TIME_COST pins the parameters; otherwise the time cost is
+    calibrated to PASSWORD_HASH_TARGET_MS on this host. Servers call this at
+    startup (see wsgi.py) so calibration never runs inside a request.
+    """
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        with _hasher_lock:
+            hasher = current_app.extensions.get('password_hasher')
+            if hasher is None:
+                config = current_app.config
+                if config['PASSWORD_HASH_TIME_COST'] is not None:
+                    hasher = PasswordHasher(time_cost=config['PASSWORD_HASH_TIME_COST'],
+                                            memory_cost=config['PASSWORD_HASH_MEMORY_COST'],
+                                            parallelism=1, hash_len=32)
+                else:
+                    hasher = _calibrate_password_hasher(config['PASSWORD_HASH_TARGET_MS'],
+                                                        memory_cost=config['PASSWORD_HASH_MEMORY_COST'])
+                current_app.extensions['password_hasher'] = hasher
+    return hasher
+
+def init_app(app, config_class=Config, **overrides):
+    """Configure app from config_class and bind the shared extensions; keyword arguments override config keys"""
+    app.json = OrjsonProvider(app)
+    
+    # Configuration
+    app.config.from_object(config_class)
+    app.config.update(overrides)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config['JWT_KEY_BYTES'] = app.config['JWT_SECRET_KEY'].encode('utf-8')
+    
+    # Initialize extensions
+    db.init_app(app)
+    migrate.init_app(app, db)
+    jwt.init_app(app)
+    cors.init_app(app)
+    compress.init_app(app)
+
+# Models
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def set_password(self, password):
+        self.password_hash = password_hasher().hash(password)
+    
+    def check_password(self, password):
+        # Legacy Werkzeug hashes (pbkdf2:..., scrypt:...) are still accepted until rehashed
+        if not self.password_hash.startswith('$argon2'):
+            try:
+                return check_password_hash(self.password_hash, password)
+            except ValueError:
+                return False
+        try:
+            return password_hasher().verify(self.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    def needs_rehash(self):
+        if not self.password_hash.startswith('$argon2id$'):
+            return True
+        # Only ever upgrade, so hosts or workers that calibrated differently never undo each other
+        stored, current = extract_parameters(self.password_hash), password_hasher()
+        return stored.time_cost < current.time_cost or stored.memory_cost < current.memory_cost
+
+class Task(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    completed = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    __table_args__ = (
+        # Serves the per-user list ordered by newest first as an index range scan;
+        # id breaks ties between tasks created within the same second
+        db.Index('ix_task_user_created', user_id, created_at.desc(), id.desc()),
+        # Serves single-task lookups scoped to the owning user
+        db.Index('ix_task_user_id_id', user_id, id),
+    )
+    # Fetch the server-generated timestamps in the INSERT/UPDATE itself
+    __mapper_args__ = {'eager_defaults': True}
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'completed': self.completed,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+# Input format checks, compiled once at import
+USERNAME_RE = re.compile(r'\A[A-Za-z0-9_.-]{3,80}\Z', re.ASCII)
+EMAIL_RE = re.compile(r'\A[^\s@]+@[^\s@]+\.[^\s@]+\Z', re.ASCII)
+EMAIL_MAX_LENGTH = 120
+TITLE_MAX_LENGTH = 200
+
+# Request bodies, validated by msgspec's compiled decoder
+NonEmptyStr = Annotated[str, msgspec.Meta(min_length=1)]
+
+class RegisterBody(msgspec.Struct):
+    username: NonEmptyStr
+    email: NonEmptyStr
+    password: NonEmptyStr
+
+class LoginBody(msgspec.Struct):
+    username: NonEmptyStr
+    password: NonEmptyStr
+
+# Columns returned by UPDATE ... RETURNING for task responses
+TASK_COLUMNS = (Task.id, Task.title, Task.description, Task.completed, Task.created_at, Task.updated_at)
+
+# Cached statements for the hot auth and task-list queries
+user_by_name = lambda_stmt(lambda: select(User).where(User.username == bindparam('u')))
+users_by_name_or_email = lambda_stmt(lambda: select(User.username, User.email).where(
+    or_(User.username == bindparam('u'), User.email == bindparam('e'))
+).limit(2))
+tasks_for_user = lambda_stmt(lambda: select(
+    Task.id, Task.title, Task.completed, Task.created_at, Task.updated_at
+).where(Task.user_id == bindparam('uid')).order_by(Task.created_at.desc(), Task.id.desc()))
+tasks_with_description_for_user = lambda_stmt(lambda: select(
+    Task.id, Task.title, Task.completed, Task.created_at, Task.updated_at, Task.description
+).where(Task.user_id == bindparam('uid')).order_by(Task.created_at.desc(), Task.id.desc()))
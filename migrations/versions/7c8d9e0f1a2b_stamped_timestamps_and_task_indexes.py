@@ -0,0 +1,57 @@
+"""database-stamped timestamps, wider password hash and task indexes
+
+Revision ID: 7c8d9e0f1a2b
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-15 04:53:15.233513
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c8d9e0f1a2b'
+down_revision = '1a2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows written before the database stamped them may have no timestamps
+    user = sa.table('user', sa.column('created_at', sa.DateTime()))
+    task = sa.table('task', sa.column('created_at', sa.DateTime()), sa.column('updated_at', sa.DateTime()))
+    op.execute(user.update().where(user.c.created_at.is_(None)).values(created_at=sa.func.now()))
+    op.execute(task.update().where(task.c.created_at.is_(None)).values(created_at=sa.func.now()))
+    op.execute(task.update().where(task.c.updated_at.is_(None)).values(updated_at=task.c.created_at))
+
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=120),
+                              type_=sa.String(length=256), existing_nullable=False)
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), type_=sa.DateTime(timezone=True),
+                              nullable=False, server_default=sa.func.now())
+
+    with op.batch_alter_table('task') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), type_=sa.DateTime(timezone=True),
+                              nullable=False, server_default=sa.func.now())
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), type_=sa.DateTime(timezone=True),
+                              nullable=False, server_default=sa.func.now())
+
+    op.create_index('ix_task_user_created', 'task', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')])
+    op.create_index('ix_task_user_id_id', 'task', ['user_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_task_user_id_id', table_name='task')
+    op.drop_index('ix_task_user_created', table_name='task')
+
+    with op.batch_alter_table('task') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(timezone=True), type_=sa.DateTime(),
+                              nullable=True, server_default=None)
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), type_=sa.DateTime(),
+                              nullable=True, server_default=None)
+
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), type_=sa.DateTime(),
+                              nullable=True, server_default=None)
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=256),
+                              type_=sa.String(length=120), existing_nullable=False)
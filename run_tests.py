@@ -3,7 +3,6 @@
 Test runner script for the Task Manager API
 """
 
-import subprocess
 import sys
 import os
 
@@ -11,50 +10,55 @@ def run_tests():
     """Run the test suite"""
     print("🧪 Running Task Manager API Tests...")
     print("=" * 50)
-    
+
     # Change to the project directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    
+
     try:
-        # Run pytest with coverage
-        result = subprocess.run([
-            sys.executable, '-m', 'pytest', 
-            'test_app.py', 
-            '--verbose',
-            '--cov=app',
-            '--cov-report=html',
-            '--cov-report=term-missing'
-        ], check=True)
-        
-        print("\n✅ All tests passed!")
-        print("\n📊 Coverage report generated in htmlcov/index.html")
-        
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Tests failed with exit code {e.returncode}")
-        sys.exit(1)
-    except FileNotFoundError:
+        import pytest
+    except ImportError:
         print("❌ pytest not found. Please install it with: pip install pytest pytest-cov")
         sys.exit(1)
 
+    # Run pytest with coverage in this interpreter
+    exit_code = pytest.main([
+        'test_app.py',
+        'test_app_with_docs.py',
+        '--verbose',
+        '--cov=app',
+        '--cov=app_with_docs',
+        '--cov=core',
+        '--cov-report=html',
+        '--cov-report=term-missing'
+    ])
+
+    if exit_code != 0:
+        print(f"\n❌ Tests failed with exit code {int(exit_code)}")
+        sys.exit(int(exit_code))
+
+    print("\n✅ All tests passed!")
+    print("\n📊 Coverage report generated in htmlcov/index.html")
+
 def run_specific_test(test_name):
     """Run a specific test"""
     print(f"🧪 Running test: {test_name}")
     print("=" * 50)
-    
-    try:
-        subprocess.run([
-            sys.executable, '-m', 'pytest', 
-            f'test_app.py::{test_name}',
-            '--verbose'
-        ], check=True)
-        print(f"\n✅ Test {test_name} passed!")
-    except subprocess.CalledProcessError:
+
+    import pytest
+
+    exit_code = pytest.main([
+        f'test_app.py::{test_name}',
+        '--verbose'
+    ])
+
+    if exit_code != 0:
         print(f"\n❌ Test {test_name} failed!")
         sys.exit(1)
 
+    print(f"\n✅ Test {test_name} passed!")
+
 if __name__ == '__main__':
     if len(sys.argv) > 1:
         run_specific_test(sys.argv[1])
     else:
         run_tests()
-
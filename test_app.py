@@ -1,47 +1,18 @@
+import brotli
+import gzip
 import pytest
-import json
-from app import app, db, User, Task
-from flask_jwt_extended import create_access_token
-
-@pytest.fixture
-def client():
-    """Create a test client"""
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
-    
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            yield client
-            db.drop_all()
-
-@pytest.fixture
-def test_user():
-    """Create a test user"""
-    user = User(username='testuser', email='test@example.com')
-    user.set_password('testpassword')
-    db.session.add(user)
-    db.session.commit()
-    return user
-
-@pytest.fixture
-def auth_headers(test_user):
-    """Create authentication headers"""
-    access_token = create_access_token(identity=test_user.id)
-    return {'Authorization': f'Bearer {access_token}'}
-
-@pytest.fixture
-def test_task(test_user):
-    """Create a test task"""
-    task = Task(
-        title='Test Task',
-        description='Test Description',
-        user_id=test_user.id
-    )
-    db.session.add(task)
-    db.session.commit()
-    return task
+import sqlite3
+import zlib
+from datetime import timedelta
+from app import create_app
+from app_with_docs import create_app as create_docs_app
+from argon2 import PasswordHasher
+from config import TestingConfig
+from core import db, User, Task
+from sqlalchemy import event, insert
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_migrate import upgrade
+from werkzeug.security import generate_password_hash
 
 class TestUserRegistration:
     def test_register_success(self, client):
@@ -51,12 +22,10 @@ class TestUserRegistration:
             'email': 'newuser@example.com',
             'password': 'password123'
         }
-        response = client.post('/api/auth/register', 
-                             data=json.dumps(data),
-                             content_type='application/json')
+        response = client.post('/api/auth/register', json=data)
         
         assert response.status_code == 201
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'access_token' in data
         assert data['user']['username'] == 'newuser'
         assert data['user']['email'] == 'newuser@example.com'
@@ -64,29 +33,77 @@ class TestUserRegistration:
     def test_register_missing_fields(self, client):
         """Test registration with missing fields"""
         data = {'username': 'newuser'}
-        response = client.post('/api/auth/register',
-                             data=json.dumps(data),
-                             content_type='application/json')
+        response = client.post('/api/auth/register', json=data)
         
         assert response.status_code == 400
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'error' in data
 
-    def test_register_duplicate_username(self, client, test_user):
+    def test_register_duplicate_username(self, client, duplicate_user):
         """Test registration with duplicate username"""
         data = {
-            'username': 'testuser',
+            'username': 'dupuser',
             'email': 'different@example.com',
             'password': 'password123'
         }
-        response = client.post('/api/auth/register',
-                             data=json.dumps(data),
-                             content_type='application/json')
+        response = client.post('/api/auth/register', json=data)
         
         assert response.status_code == 400
-        data = json.loads(response.data)
+        data = response.get_json()
+        assert 'Username already exists' in data['error']
+
+    def test_register_duplicate_email(self, client, duplicate_user):
+        """Test registration with duplicate email"""
+        data = {
+            'username': 'differentuser',
+            'email': 'dup@example.com',
+            'password': 'password123'
+        }
+        response = client.post('/api/auth/register', json=data)
+
+        assert response.status_code == 400
+        data = response.get_json()
+        assert 'Email already exists' in data['error']
+
+    def test_register_username_and_email_taken_by_different_users(self, client, test_user, duplicate_user):
+        """Test that a username clash is reported even when the email belongs to another user"""
+        data = {
+            'username': duplicate_user.username,
+            'email': test_user.email,
+            'password': 'password123'
+        }
+        response = client.post('/api/auth/register', json=data)
+
+        assert response.status_code == 400
+        data = response.get_json()
         assert 'Username already exists' in data['error']
 
+    def test_register_invalid_username(self, client):
+        """Test registration with a malformed username"""
+        data = {
+            'username': 'no spaces!',
+            'email': 'newuser@example.com',
+            'password': 'password123'
+        }
+        response = client.post('/api/auth/register', json=data)
+
+        assert response.status_code == 400
+        data = response.get_json()
+        assert 'Username must be' in data['error']
+
+    def test_register_invalid_email(self, client):
+        """Test registration with a malformed email"""
+        data = {
+            'username': 'newuser',
+            'email': 'not-an-email',
+            'password': 'password123'
+        }
+        response = client.post('/api/auth/register', json=data)
+
+        assert response.status_code == 400
+        data = response.get_json()
+        assert 'Invalid email address' in data['error']
+
 class TestUserLogin:
     def test_login_success(self, client, test_user):
         """Test successful user login"""
@@ -94,76 +111,129 @@ class TestUserLogin:
             'username': 'testuser',
             'password': 'testpassword'
         }
-        response = client.post('/api/auth/login',
-                             data=json.dumps(data),
-                             content_type='application/json')
+        response = client.post('/api/auth/login', json=data)
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'access_token' in data
         assert data['user']['username'] == 'testuser'
 
+    def test_login_upgrades_legacy_hash(self, client):
+        """Test login with a legacy Werkzeug hash rehashes it with Argon2id"""
+        user = User(username='legacyuser', email='legacy@example.com',
+                    password_hash=generate_password_hash('legacypassword', method='pbkdf2:sha256:1000'))
+        db.session.add(user)
+        db.session.commit()
+
+        data = {
+            'username': 'legacyuser',
+            'password': 'legacypassword'
+        }
+        response = client.post('/api/auth/login', json=data)
+
+        assert response.status_code == 200
+        assert user.password_hash.startswith('$argon2id$')
+        assert user.check_password('legacypassword')
+
+    @pytest.mark.parametrize('password_hash,status', [
+        (generate_password_hash('otherpassword', method='scrypt'), 200),
+        ('not-a-known-hash-format', 401),
+        ('$argon2id$v=19$corrupted', 401),
+    ], ids=['werkzeug_scrypt', 'unknown_format', 'corrupt_argon2'])
+    def test_login_with_foreign_hash(self, client, password_hash, status):
+        """Test login against stored hashes that are not Argon2id or pbkdf2"""
+        user = User(username='foreignuser', email='foreign@example.com', password_hash=password_hash)
+        db.session.add(user)
+        db.session.commit()
+
+        response = client.post('/api/auth/login', json={'username': 'foreignuser', 'password': 'otherpassword'})
+
+        assert response.status_code == status
+        if status == 200:
+            assert user.password_hash.startswith('$argon2id$')
+
+    def test_login_keeps_stronger_hash(self, client):
+        """Test login does not downgrade a hash made with stronger parameters"""
+        user = User(username='stronguser', email='strong@example.com',
+                    password_hash=PasswordHasher(time_cost=2, memory_cost=16, parallelism=1).hash('strongpassword'))
+        db.session.add(user)
+        db.session.commit()
+        stored_hash = user.password_hash
+
+        response = client.post('/api/auth/login', json={'username': 'stronguser', 'password': 'strongpassword'})
+
+        assert response.status_code == 200
+        assert user.password_hash == stored_hash
+
+    def test_password_hasher_built_on_first_use(self):
+        """Test creating the app does not calibrate the password hasher"""
+        app = create_app(TestingConfig, SQLALCHEMY_DATABASE_URI='sqlite://')
+        assert 'password_hasher' not in app.extensions
+
     def test_login_invalid_credentials(self, client):
         """Test login with invalid credentials"""
         data = {
             'username': 'testuser',
             'password': 'wrongpassword'
         }
-        response = client.post('/api/auth/login',
-                             data=json.dumps(data),
-                             content_type='application/json')
+        response = client.post('/api/auth/login', json=data)
         
         assert response.status_code == 401
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'Invalid credentials' in data['error']
 
     def test_login_missing_fields(self, client):
         """Test login with missing fields"""
         data = {'username': 'testuser'}
-        response = client.post('/api/auth/login',
-                             data=json.dumps(data),
-                             content_type='application/json')
+        response = client.post('/api/auth/login', json=data)
         
         assert response.status_code == 400
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'error' in data
 
 class TestTaskCRUD:
-    def test_create_task_success(self, client, auth_headers):
-        """Test successful task creation"""
-        data = {
-            'title': 'New Task',
-            'description': 'Task Description'
-        }
+    @pytest.mark.parametrize('payload,status,err', [
+        ({'title': 'New Task', 'description': 'Task Description'}, 201, None),
+        ({'description': 'Task Description'}, 400, 'Title is required'),
+        ({'title': 'x' * 201}, 400, 'at most 200 characters'),
+        ({'title': 5}, 400, 'Title must be a string'),
+    ], ids=['success', 'missing_title', 'title_too_long', 'title_not_string'])
+    def test_create_task(self, client, auth_headers, payload, status, err):
+        """Test task creation with valid and invalid payloads"""
         response = client.post('/api/tasks',
-                             data=json.dumps(data),
-                             content_type='application/json',
+                             json=payload,
                              headers=auth_headers)
         
-        assert response.status_code == 201
-        data = json.loads(response.data)
-        assert data['task']['title'] == 'New Task'
-        assert data['task']['description'] == 'Task Description'
-        assert data['task']['completed'] == False
-
-    def test_create_task_missing_title(self, client, auth_headers):
-        """Test task creation without title"""
-        data = {'description': 'Task Description'}
-        response = client.post('/api/tasks',
-                             data=json.dumps(data),
-                             content_type='application/json',
-                             headers=auth_headers)
+        assert response.status_code == status
+        data = response.get_json()
+        if err is None:
+            assert data['task']['title'] == 'New Task'
+            assert data['task']['description'] == 'Task Description'
+            assert data['task']['completed'] == False
+        else:
+            assert err in data['error']
+
+    def test_create_task_without_reload(self, client, auth_headers):
+        """Test that creating a task reads its timestamps from the INSERT, not a later SELECT"""
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement.split(None, 1)[0].upper())
         
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'Title is required' in data['error']
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.post('/api/tasks', json={'title': 'New Task'}, headers=auth_headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        
+        assert response.status_code == 201
+        assert response.get_json()['task']['created_at']
+        assert statements.count('INSERT') == 1
+        assert 'SELECT' not in statements
 
     def test_create_task_unauthorized(self, client):
         """Test task creation without authentication"""
         data = {'title': 'New Task'}
-        response = client.post('/api/tasks',
-                             data=json.dumps(data),
-                             content_type='application/json')
+        response = client.post('/api/tasks', json=data)
         
         assert response.status_code == 401
 
@@ -172,33 +242,84 @@ class TestTaskCRUD:
         response = client.get('/api/tasks', headers=auth_headers)
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json()
         assert len(data['tasks']) == 1
         assert data['tasks'][0]['title'] == 'Test Task'
         assert data['count'] == 1
+        assert 'description' not in data['tasks'][0]
+
+    def test_get_tasks_include_description(self, client, auth_headers, test_task):
+        """Test getting all tasks with descriptions included"""
+        response = client.get('/api/tasks?include=description', headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['tasks'][0]['description'] == 'Test Description'
 
     def test_get_tasks_unauthorized(self, client):
         """Test getting tasks without authentication"""
         response = client.get('/api/tasks')
         assert response.status_code == 401
 
+    @pytest.mark.parametrize('app', [create_app, create_docs_app], ids=['app', 'app_with_docs'], indirect=True)
+    @pytest.mark.parametrize('accept,encoding,decode', [
+        ('br, gzip, deflate', 'br', brotli.decompress),
+        ('gzip', 'gzip', gzip.decompress),
+        ('deflate', 'deflate', zlib.decompress),
+    ], ids=['br', 'gzip', 'deflate'])
+    def test_get_tasks_compressed(self, client, auth_headers, test_user, accept, encoding, decode):
+        """Test that the task list, buffered or streamed, is compressed with the best encoding the client accepts"""
+        db.session.execute(insert(Task), [{'title': f'Task {i}', 'user_id': test_user.id} for i in range(20)])
+        db.session.commit()
+        
+        response = client.get('/api/tasks', headers=[*auth_headers, ('Accept-Encoding', accept)])
+        
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == encoding
+        assert client.application.json.loads(decode(response.data))['count'] == 20
+
+    def test_token_claims_cached(self, client, auth_headers, monkeypatch):
+        """Test a verified token is served from the claims cache on later requests"""
+        client.get('/api/tasks', headers=auth_headers)
+
+        def _decode_again(*args, **kwargs):
+            raise AssertionError('token was decoded again')
+        monkeypatch.setattr(JWTManager, '_decode_jwt_from_config', _decode_again)
+
+        response = client.get('/api/tasks', headers=auth_headers)
+        assert response.status_code == 200
+
+    def test_token_claims_not_cached_past_expiry(self, client, test_user, monkeypatch):
+        """Test a cached token is rejected once it expires"""
+        token = create_access_token(identity=test_user.id, expires_delta=timedelta(seconds=-5))
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        # Accepted while the decode leeway still covers the expiry, caching its claims
+        monkeypatch.setitem(client.application.config, 'JWT_DECODE_LEEWAY', 60)
+        assert client.get('/api/tasks', headers=headers).status_code == 200
+        
+        monkeypatch.setitem(client.application.config, 'JWT_DECODE_LEEWAY', 0)
+        response = client.get('/api/tasks', headers=headers)
+        assert response.status_code == 401
+
+    def test_get_task_with_string_identity(self, client, test_user, test_task):
+        """Test that a token whose subject is the user id as a string still owns the task"""
+        token = create_access_token(identity=str(test_user.id))
+        response = client.get(f'/api/tasks/{test_task.id}',
+                            headers={'Authorization': f'Bearer {token}'})
+        
+        assert response.status_code == 200
+        assert response.get_json()['task']['id'] == test_task.id
+
     def test_get_specific_task_success(self, client, auth_headers, test_task):
         """Test getting a specific task"""
         response = client.get(f'/api/tasks/{test_task.id}', headers=auth_headers)
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json()
         assert data['task']['title'] == 'Test Task'
         assert data['task']['id'] == test_task.id
 
-    def test_get_specific_task_not_found(self, client, auth_headers):
-        """Test getting a non-existent task"""
-        response = client.get('/api/tasks/999', headers=auth_headers)
-        
-        assert response.status_code == 404
-        data = json.loads(response.data)
-        assert 'Task not found' in data['error']
-
     def test_update_task_success(self, client, auth_headers, test_task):
         """Test successful task update"""
         data = {
@@ -207,78 +328,143 @@ class TestTaskCRUD:
             'completed': True
         }
         response = client.put(f'/api/tasks/{test_task.id}',
-                            data=json.dumps(data),
-                            content_type='application/json',
+                            json=data,
                             headers=auth_headers)
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json()
         assert data['task']['title'] == 'Updated Task'
         assert data['task']['completed'] == True
 
-    def test_update_task_not_found(self, client, auth_headers):
-        """Test updating a non-existent task"""
-        data = {'title': 'Updated Task'}
-        response = client.put('/api/tasks/999',
-                            data=json.dumps(data),
-                            content_type='application/json',
+    @pytest.mark.parametrize('payload,err', [
+        ({'title': 5}, 'Title must be a string'),
+        ({'title': None}, 'Title must be a string'),
+        ({'title': 'x' * 201}, 'at most 200 characters'),
+    ], ids=['title_not_string', 'title_null', 'title_too_long'])
+    def test_update_task_invalid(self, client, auth_headers, test_task, payload, err):
+        """Test task update with invalid payloads"""
+        response = client.put(f'/api/tasks/{test_task.id}',
+                            json=payload,
                             headers=auth_headers)
         
-        assert response.status_code == 404
-        data = json.loads(response.data)
-        assert 'Task not found' in data['error']
+        assert response.status_code == 400
+        assert err in response.get_json()['error']
+        assert db.session.get(Task, test_task.id).title == 'Test Task'
+
+    @pytest.mark.parametrize('method,body', [
+        ('POST', {}),
+        ('POST', {'json': ['New Task']}),
+        ('PUT', {}),
+        ('PUT', {'json': ['Updated Task']}),
+        ('PUT', {'data': 'not json', 'content_type': 'application/json'}),
+    ], ids=['create_no_body', 'create_list', 'update_no_body', 'update_list', 'update_malformed'])
+    def test_task_body_not_object(self, client, auth_headers, test_task, method, body):
+        """Test task writes whose body is missing or not a JSON object"""
+        url = '/api/tasks' if method == 'POST' else f'/api/tasks/{test_task.id}'
+        response = client.open(url, method=method, headers=auth_headers, **body)
+        
+        assert response.status_code == 400
+        assert 'must be a JSON object' in response.get_json()['error']
 
     def test_delete_task_success(self, client, auth_headers, test_task):
         """Test successful task deletion"""
         response = client.delete(f'/api/tasks/{test_task.id}', headers=auth_headers)
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'Task deleted successfully' in data['message']
 
-    def test_delete_task_not_found(self, client, auth_headers):
-        """Test deleting a non-existent task"""
-        response = client.delete('/api/tasks/999', headers=auth_headers)
+    @pytest.mark.parametrize('method,body', [
+        ('GET', None),
+        ('PUT', {'title': 'Updated Task'}),
+        ('DELETE', None),
+    ], ids=['get', 'update', 'delete'])
+    def test_task_not_found(self, client, auth_headers, method, body):
+        """Test reading, updating and deleting a non-existent task"""
+        response = client.open('/api/tasks/999',
+                             method=method,
+                             json=body,
+                             headers=auth_headers)
         
         assert response.status_code == 404
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'Task not found' in data['error']
 
-    def test_user_isolation(self, client, test_user):
+    def test_user_isolation(self, client, auth_headers, headers_for):
         """Test that users can only access their own tasks"""
-        # Create another user
+        # Create another user and a task for them in a single commit
         other_user = User(username='otheruser', email='other@example.com')
         other_user.set_password('password123')
         db.session.add(other_user)
-        db.session.commit()
+        db.session.flush()
         
-        # Create task for other user
         other_task = Task(title='Other Task', user_id=other_user.id)
         db.session.add(other_task)
         db.session.commit()
         
-        # Try to access other user's task
-        access_token = create_access_token(identity=test_user.id)
-        headers = {'Authorization': f'Bearer {access_token}'}
+        # The owner can see the task
+        other_headers = headers_for(other_user.id)
+        response = client.get(f'/api/tasks/{other_task.id}', headers=other_headers)
+        assert response.status_code == 200
         
-        response = client.get(f'/api/tasks/{other_task.id}', headers=headers)
+        # Try to access other user's task
+        response = client.get(f'/api/tasks/{other_task.id}', headers=auth_headers)
+        assert response.status_code == 404
+
+        response = client.put(f'/api/tasks/{other_task.id}',
+                            json={'title': 'Hijacked'},
+                            headers=auth_headers)
         assert response.status_code == 404
 
+        response = client.delete(f'/api/tasks/{other_task.id}', headers=auth_headers)
+        assert response.status_code == 404
+        assert db.session.get(Task, other_task.id).title == 'Other Task'
+
 class TestAPIEndpoints:
     def test_home_endpoint(self, client):
         """Test the home endpoint"""
         response = client.get('/')
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'Task Manager API' in data['message']
 
     def test_404_error(self, client):
         """Test 404 error handling"""
         response = client.get('/nonexistent')
         assert response.status_code == 404
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'Endpoint not found' in data['error']
 
+class TestMigrations:
+    def test_upgrade_legacy_database(self, tmp_path):
+        """Test migrating a database created by db.create_all() before migrations existed"""
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript('''
+            CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE,
+                email VARCHAR(120) NOT NULL UNIQUE, password_hash VARCHAR(120) NOT NULL, created_at DATETIME);
+            CREATE TABLE task (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, description TEXT,
+                completed BOOLEAN NOT NULL, created_at DATETIME, updated_at DATETIME,
+                user_id INTEGER NOT NULL REFERENCES user (id));
+            INSERT INTO user (username, email, password_hash) VALUES ('old', 'old@example.com', 'x');
+            INSERT INTO task (title, completed, user_id) VALUES ('Old Task', 0, 1);
+        ''')
+        conn.close()
+
+        app = create_app(TestingConfig, SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+        with app.app_context():
+            upgrade()
+            db.engine.dispose()
+
+        conn = sqlite3.connect(path)
+        assert conn.execute('SELECT count(*) FROM task WHERE created_at IS NULL OR updated_at IS NULL').fetchone() == (0,)
+        assert conn.execute('SELECT count(*) FROM user WHERE created_at IS NULL').fetchone() == (0,)
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list('task')")}
+        assert {'ix_task_user_created', 'ix_task_user_id_id'} <= indexes
+        schema = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'user'").fetchone()[0]
+        assert 'VARCHAR(256)' in schema
+        conn.close()
+
 if __name__ == '__main__':
     pytest.main([__file__])
 
@@ -0,0 +1,62 @@
+import pytest
+from app_with_docs import create_app
+from core import db, Task
+from sqlalchemy import insert
+from sqlalchemy.engine import Result
+
+@pytest.fixture
+def app(make_app):
+    """Run this module's tests against the documented app"""
+    return make_app(create_app)
+
+class TestTaskList:
+    def test_list_tasks_empty(self, client, auth_headers):
+        """Test the streamed list for a user without tasks"""
+        response = client.get('/api/tasks', headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        assert response.get_json() == {'tasks': [], 'count': 0}
+
+    def test_list_tasks_across_partitions(self, client, auth_headers, test_user):
+        """Test a list long enough to span several fetched batches"""
+        db.session.execute(insert(Task), [
+            {'title': f'Task {i}', 'user_id': test_user.id} for i in range(1201)
+        ])
+        db.session.commit()
+        
+        response = client.get('/api/tasks', headers=auth_headers)
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['count'] == 1201
+        ids = [task['id'] for task in data['tasks']]
+        assert len(set(ids)) == 1201
+        # Tasks created within the same second come newest first by id
+        assert ids == sorted(ids, reverse=True)
+        assert 'description' not in data['tasks'][0]
+
+    def test_list_tasks_include_description(self, client, auth_headers, test_task):
+        """Test that ?include=description adds descriptions to the stream"""
+        response = client.get('/api/tasks?include=description', headers=auth_headers)
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['count'] == 1
+        assert data['tasks'][0]['title'] == 'Test Task'
+        assert data['tasks'][0]['description'] == 'Test Description'
+
+    def test_list_tasks_fetch_error(self, client, auth_headers, test_task, monkeypatch):
+        """Test that a failure fetching the first batch returns 500 instead of a broken stream"""
+        def fail(self, size=None):
+            raise RuntimeError('fetch failed')
+            yield
+        
+        monkeypatch.setattr(Result, 'partitions', fail)
+        response = client.get('/api/tasks', headers=auth_headers)
+        
+        assert response.status_code == 500
+        assert response.get_json() == {'error': 'fetch failed'}
+
+if __name__ == '__main__':
+    pytest.main([__file__])
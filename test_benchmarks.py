@@ -0,0 +1,14 @@
+import pytest
+
+pytestmark = pytest.mark.perf
+
+def test_bench_list_tasks(benchmark, client, auth_headers, test_task):
+    """Benchmark listing tasks (query and serialization)"""
+    response = benchmark(lambda: client.get('/api/tasks', headers=auth_headers))
+    assert response.status_code == 200
+
+def test_bench_login(benchmark, client, test_user):
+    """Benchmark logging in (password verify and JWT signing)"""
+    data = {'username': 'testuser', 'password': 'testpassword'}
+    response = benchmark(lambda: client.post('/api/auth/login', json=data))
+    assert response.status_code == 200
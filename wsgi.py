@@ -0,0 +1,22 @@
+"""
+WSGI entry point for production servers
+
+Apply pending migrations once per deploy, before starting the workers:
+
+    flask --app app db upgrade
+
+Run with threaded workers so a slow password hash on one request does not
+block the others (argon2-cffi releases the GIL while hashing):
+
+    gunicorn -w $(nproc) -k gthread --threads 8 --preload wsgi:app
+"""
+
+from app_with_docs import create_app
+from core import password_hasher
+
+app = create_app()
+
+with app.app_context():
+    # Calibrate the password hasher before serving, so no request pays for it
+    # or measures it under load; --preload workers inherit the result
+    password_hasher()